@@ -1,7 +1,13 @@
+import os
+import multiprocessing
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import chain
 import streamlit as st
-from typing import List
-from src.processor import PDFProcessor
-from src.embedding import EmbeddingManager
+from typing import List, Optional
+from src.processor import PDFProcessor, process_pdf_bytes
+from src.embedding import EmbeddingManager, load_embedding_model
 from src.chat import ChatManager
 from src.config import Config
 from src.history import UserHistoryManager
@@ -11,12 +17,18 @@ st.set_page_config(page_title="RAG Chatbot", page_icon="🤖", layout="wide")
 
 history_manager = UserHistoryManager()
 
+@st.cache_resource(show_spinner="Loading embedding model...")
+def get_embedding_model():
+    """Load the embedding model once per process and share it across sessions."""
+    return load_embedding_model()
+
+
 def initialize_session_state() -> bool:
     """Initialize core objects and session keys."""
     if "processor" not in st.session_state:
         st.session_state.processor = PDFProcessor()
     if "embedding_manager" not in st.session_state:
-        st.session_state.embedding_manager = EmbeddingManager()
+        st.session_state.embedding_manager = EmbeddingManager(get_embedding_model())
     if "chat_manager" not in st.session_state:
         if not Config.is_valid() or not Config.GOOGLE_API_KEY:
             st.error("Missing API key. Please set GEMINI_API_KEY in .env")
@@ -36,6 +48,30 @@ def initialize_session_state() -> bool:
 
 # ---------------- Conversation / History Helpers -----------------
 
+@st.cache_data(ttl=5, max_entries=1000, show_spinner=False)
+def _cached_conversations(username: str, session_token: str, version: int):
+    """Conversation rows for a user; `session_token` and `version` are part of the cache key."""
+    return history_manager.get_conversations(username)
+
+
+def get_conversations(username: str):
+    """Conversation list for the sidebar, fetched at most once per change."""
+    # The cache is process-wide but the version counter is per session, so key on
+    # the session too; otherwise two sessions of one user share stale entries
+    if "conversations_cache_token" not in st.session_state:
+        st.session_state.conversations_cache_token = uuid.uuid4().hex
+    return _cached_conversations(
+        username,
+        st.session_state.conversations_cache_token,
+        st.session_state.get("conversations_version", 0),
+    )
+
+
+def invalidate_conversations():
+    """Bump the version so the next get_conversations call hits the database."""
+    st.session_state.conversations_version = st.session_state.get("conversations_version", 0) + 1
+
+
 def load_chat_history(username: str):
     """Legacy load of last conversation into messages list."""
     try:
@@ -49,21 +85,35 @@ def load_chat_history(username: str):
         st.error(f"Error loading chat history: {e}")
 
 
+def set_messages(rows):
+    """
+    Show stored (role, content, timestamp) rows and replay their tail into chat memory.
+    Callers fetch HISTORY_LOAD_LIMIT + 1 rows; the extra (oldest) row only signals
+    that older history exists and is not displayed.
+    """
+    st.session_state.history_truncated = len(rows) > Config.HISTORY_LOAD_LIMIT
+    rows = rows[-Config.HISTORY_LOAD_LIMIT:] if Config.HISTORY_LOAD_LIMIT > 0 else []
+    st.session_state.messages = [
+        {"role": role, "content": content} for role, content, _ts in rows
+    ]
+    if "chat_manager" in st.session_state:
+        st.session_state.chat_manager.load_history(st.session_state.messages)
+
+
 def load_current_conversation(username: str):
     """Load most recent conversation and populate messages."""
     try:
-        conversations = history_manager.get_conversations(username)
+        conversations = get_conversations(username)
         if conversations:
             convo_id = conversations[0][0]
             st.session_state.current_conversation_id = convo_id
-            data = history_manager.get_conversation_messages(convo_id)
-            st.session_state.messages = [
-                {"role": role, "content": content} for role, content, _ts in data
-            ]
+            set_messages(history_manager.get_conversation_messages(convo_id, limit=Config.HISTORY_LOAD_LIMIT + 1))
         else:
             convo_id = history_manager.create_conversation(username, "New Conversation")
+            invalidate_conversations()
             st.session_state.current_conversation_id = convo_id
             st.session_state.messages = []
+            st.session_state.history_truncated = False
     except Exception as e:  # pragma: no cover
         st.error(f"Error loading conversation: {e}")
 
@@ -71,10 +121,7 @@ def load_current_conversation(username: str):
 def load_conversation(conversation_id: int):
     """Switch to a specific conversation id."""
     try:
-        data = history_manager.get_conversation_messages(conversation_id)
-        st.session_state.messages = [
-            {"role": role, "content": content} for role, content, _ts in data
-        ]
+        set_messages(history_manager.get_conversation_messages(conversation_id, limit=Config.HISTORY_LOAD_LIMIT + 1))
         st.session_state.current_conversation_id = conversation_id
     except Exception as e:  # pragma: no cover
         st.error(f"Error loading conversation: {e}")
@@ -83,21 +130,49 @@ def load_conversation(conversation_id: int):
 def create_new_conversation(username: str) -> int:
     """Create a new empty conversation and reset chat manager memory."""
     convo_id = history_manager.create_conversation(username)
+    invalidate_conversations()
     st.session_state.current_conversation_id = convo_id
     st.session_state.messages = []
+    st.session_state.history_truncated = False
     st.session_state.chat_manager.reset_conversation()
     return convo_id
 
 # ---------------- Document Processing -----------------
 
+@st.cache_resource
+def get_pdf_pool() -> ProcessPoolExecutor:
+    """Long-lived PDF parsing pool, so worker start-up is paid once per server."""
+    # "spawn" avoids forking the Streamlit server's threads
+    return ProcessPoolExecutor(
+        max_workers=os.cpu_count() or 1,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
 def process_documents(uploaded_files: List) -> bool:
     """Process uploaded PDFs, build embeddings, wire retriever."""
     try:
         with st.spinner("Processing documents..."):
-            all_docs = []
-            for file in uploaded_files:
-                docs = st.session_state.processor.process_document(file)
-                all_docs.extend(docs)
+            processor = st.session_state.processor
+            all_docs = None
+            total_bytes = sum(file.size for file in uploaded_files)
+            if (
+                len(uploaded_files) > 1
+                and (os.cpu_count() or 1) > 1
+                and total_bytes >= Config.PARALLEL_PDF_MIN_BYTES
+            ):
+                # PyPDF2 is pure Python and holds the GIL, so large batches are parsed
+                # in worker processes; small ones parse faster than the IPC round-trip
+                try:
+                    all_docs = list(chain.from_iterable(get_pdf_pool().map(
+                        process_pdf_bytes,
+                        [file.name for file in uploaded_files],
+                        [file.getvalue() for file in uploaded_files],
+                    )))
+                except BrokenProcessPool:
+                    get_pdf_pool.clear()  # Respawn on next use; parse this batch serially
+            if all_docs is None:
+                all_docs = [doc for file in uploaded_files for doc in processor.process_document(file)]
             st.session_state.documents = all_docs
             success = st.session_state.embedding_manager.create_embeddings(all_docs)
             if success:
@@ -196,6 +271,7 @@ def render_sidebar():
             with colA:
                 if st.button("Clear Conversation", key="btn_clear_conversation"):
                     st.session_state.messages = []
+                    st.session_state.history_truncated = False
                     st.session_state.chat_manager.reset_conversation()
                     st.rerun()
             with colB:
@@ -204,58 +280,80 @@ def render_sidebar():
                     if hasattr(st.session_state.embedding_manager, "clear_embeddings"):
                         st.session_state.embedding_manager.clear_embeddings()
                     st.rerun()
-        st.header("Conversations")
-        if st.button("➕ New Conversation", key="btn_new_conversation"):
-            create_new_conversation(st.session_state.username)
-            st.rerun()
-        if st.session_state.current_conversation_id:
-            convs = history_manager.get_conversations(st.session_state.username)
-        if st.session_state.current_conversation_id:
-            conversations = history_manager.get_conversations(st.session_state.username)
-            current_conv = next((conv for conv in conversations if conv[0] == st.session_state.current_conversation_id), None)
-            if current_conv:
-                st.subheader(f"Current: {current_conv[1]}")
-                st.caption(f"Created: {current_conv[2][:19]}")
+        render_conversation_list()
 
-        st.markdown("---")
 
-        # List all conversations
-        conversations = history_manager.get_conversations(st.session_state.username)
+@st.fragment
+def render_conversation_list():
+    """Conversation switcher; deleting reruns only this fragment."""
+    st.header("Conversations")
+    if st.button("➕ New Conversation", key="btn_new_conversation"):
+        create_new_conversation(st.session_state.username)
+        st.rerun()
+    conversations = get_conversations(st.session_state.username)
+    if st.session_state.current_conversation_id:
+        current_conv = next((conv for conv in conversations if conv[0] == st.session_state.current_conversation_id), None)
+        if current_conv:
+            st.subheader(f"Current: {current_conv[1]}")
+            st.caption(f"Created: {current_conv[2][:19]}")
 
-        if conversations:
-            st.subheader("Your Conversations")
-            for conv_id, title, created_at, updated_at in conversations:
-                is_current = conv_id == st.session_state.current_conversation_id
-                c1, c2, c3 = st.columns([3, 1.3, 0.7])
-                with c1:
-                    label = f"💬 {title}"
-                    if is_current:
-                        st.markdown(
-                            f"<div class='conv-item active'><div class='conv-title'>{label}</div></div>",
-                            unsafe_allow_html=True,
-                        )
+    st.markdown("---")
+
+    # List all conversations
+    if conversations:
+        st.subheader("Your Conversations")
+        for conv_id, title, created_at, updated_at in conversations:
+            is_current = conv_id == st.session_state.current_conversation_id
+            c1, c2, c3 = st.columns([3, 1.3, 0.7])
+            with c1:
+                label = f"💬 {title}"
+                if is_current:
+                    st.markdown(
+                        f"<div class='conv-item active'><div class='conv-title'>{label}</div></div>",
+                        unsafe_allow_html=True,
+                    )
+                else:
+                    if st.button(label, key=f"open_{conv_id}"):
+                        load_conversation(conv_id)
+                        # The chat area lives outside this fragment, so repaint the app
+                        st.rerun()
+            with c2:
+                st.caption(f"{updated_at[:19]}")
+            with c3:
+                if st.button("🗑️", key=f"delete_{conv_id}"):
+                    if st.session_state.current_conversation_id == conv_id:
+                        st.warning("Cannot delete current conversation")
                     else:
-                        if st.button(label, key=f"open_{conv_id}"):
-                            load_conversation(conv_id)
-                            st.rerun()
-                with c2:
-                    st.caption(f"{updated_at[:19]}")
-                with c3:
-                    if st.button("🗑️", key=f"delete_{conv_id}"):
-                        if st.session_state.current_conversation_id == conv_id:
-                            st.warning("Cannot delete current conversation")
-                        else:
-                            history_manager.delete_conversation(conv_id)
-                            st.rerun()
-        else:
-            st.info("No conversations yet. Start a new conversation!")
+                        history_manager.delete_conversation(conv_id)
+                        invalidate_conversations()
+                        # Only the list changed; leave the rest of the app alone
+                        st.rerun(scope="fragment")
+    else:
+        st.info("No conversations yet. Start a new conversation!")
+
 
-    # --- MAIN CHAT UI ---
-    for message in st.session_state.messages:
+# ---------------- Main Chat -----------------
+
+def render_chat(query: Optional[str]):
+    """Message history plus the answer to a newly submitted query, if any."""
+    # Paint only the most recent messages; older ones stay collapsed until requested
+    limit = Config.CHAT_RENDER_LIMIT
+    older = st.session_state.messages[:-limit]
+    if st.session_state.get("history_truncated"):
+        st.caption(
+            f"Only the latest {Config.HISTORY_LOAD_LIMIT} messages of this conversation are loaded; "
+            "older history is not shown."
+        )
+    if older:
+        with st.expander(f"Load {len(older)} older messages"):
+            for message in older:
+                with st.chat_message(message["role"]):
+                    st.write(message["content"])
+    for message in st.session_state.messages[-limit:]:
         with st.chat_message(message["role"]):
             st.write(message["content"])
 
-    if query := st.chat_input("Ask your question"):
+    if query:
         st.session_state.messages.append({"role": "user", "content": query})
         with st.chat_message("user"):
             st.write(query)
@@ -269,21 +367,27 @@ def render_sidebar():
         with st.chat_message("assistant"):
             with st.spinner("Thinking..."):
                 if hasattr(st.session_state.embedding_manager, 'retriever') and st.session_state.embedding_manager.retriever:
-                    response = st.session_state.chat_manager.generate_response(query, [])
+                    relevant_docs = []
                 else:
                     relevant_docs = st.session_state.embedding_manager.search(query)
-                    response = st.session_state.chat_manager.generate_response(query, relevant_docs)
-                
-                st.write(response)
-                st.session_state.messages.append({"role": "assistant", "content": response})
-                
-                # Save to current conversation
-                if st.session_state.current_conversation_id:
-                    history_manager.save_message(st.session_state.current_conversation_id, "user", query)
-                    history_manager.save_message(st.session_state.current_conversation_id, "assistant", response)
-                else:
-                    # Fallback to legacy method if no conversation exists
-                    history_manager.save_history(st.session_state.username, query, response)
+                stream = st.session_state.chat_manager.generate_response_stream(query, relevant_docs)
+                # Retrieval and time-to-first-token happen here, under the spinner
+                first_chunk = next(stream, "")
+
+            # Render the remaining tokens as they arrive; write_stream returns the full text
+            response = st.write_stream(chain([first_chunk], stream))
+            st.session_state.messages.append({"role": "assistant", "content": response})
+
+            # Save to current conversation
+            if st.session_state.current_conversation_id:
+                history_manager.save_messages(
+                    st.session_state.current_conversation_id,
+                    [("user", query), ("assistant", response)],
+                )
+            else:
+                # Fallback to legacy method if no conversation exists
+                history_manager.save_history(st.session_state.username, query, response)
+            invalidate_conversations()
 
 def main():
     """Main entry point: initialize, theme, auth gate, then render UI."""
@@ -298,6 +402,8 @@ def main():
         return
     app_header("📚 PDF Chat Assistant", "Chat with your PDFs using RAG")
     render_sidebar()
+    # chat_input stays at app scope: inside a fragment it renders inline instead of pinned
+    render_chat(st.chat_input("Ask your question"))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,24 @@
+"""
+Exports Config.EMBEDDING_MODEL to ONNX and writes a dynamically INT8-quantized copy.
+
+Usage:
+    pip install "optimum[exporters]" onnxruntime
+    python -m scripts.export_onnx_embeddings [output_dir]
+
+Then set EMBEDDING_ONNX_PATH=<output_dir> to serve embeddings with ONNX Runtime.
+"""
+import os
+import sys
+from optimum.exporters.onnx import main_export
+from onnxruntime.quantization import QuantType, quantize_dynamic
+from src.config import Config
+
+if __name__ == "__main__":
+    out_dir = sys.argv[1] if len(sys.argv) > 1 else "onnx"
+    main_export(Config.EMBEDDING_MODEL, output=out_dir, task="feature-extraction")
+    quantize_dynamic(
+        os.path.join(out_dir, "model.onnx"),
+        os.path.join(out_dir, "model.int8.onnx"),
+        weight_type=QuantType.QInt8,
+    )
+    print("onnx_model_dir:", out_dir)
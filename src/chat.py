@@ -1,4 +1,4 @@
-from typing import List
+from typing import Iterator, List
 import time
 try:
     from langchain_google_genai import ChatGoogleGenerativeAI
@@ -6,7 +6,7 @@ except ImportError:  # Fallback if package structure changes
     ChatGoogleGenerativeAI = None
 
 from langchain.chains import RetrievalQA
-from langchain.memory import ConversationBufferMemory
+from langchain.memory import ConversationBufferWindowMemory
 from langchain.schema import Document
 from langchain.prompts import PromptTemplate
 from langchain.schema.messages import SystemMessage, HumanMessage
@@ -30,6 +30,9 @@ class ChatManager:
         self.memory = None
         self.chain = None
         self.llm = None
+        self._qa_prompt = None
+        self._genai_model = None
+        self._max_context_chars = Config.MAX_CONTEXT_CHARS
         self._initialize_components()
 
     def _initialize_components(self):
@@ -37,9 +40,10 @@ class ChatManager:
         Initialize LangChain components for the chat system.
         Sets up the LLM, memory, and creates the conversation chain.
         """
-        # Initialize conversation memory
-        self.memory = ConversationBufferMemory(
+        # Initialize conversation memory, bounded to the last few exchanges
+        self.memory = ConversationBufferWindowMemory(
             memory_key="chat_history",
+            k=Config.MEMORY_WINDOW_K,
             return_messages=True,
             output_key="result"
         )
@@ -72,6 +76,10 @@ class ChatManager:
                 print(f"Fallback LLM init failed: {e2}")
                 self.llm = None
 
+        # Without a LangChain LLM, reuse one raw client for every call and retry
+        if self.llm is None:
+            self._genai_model = genai.GenerativeModel(Config.MODEL_NAME or "gemini-2.0-flash")
+
     def _create_chain(self, retriever):
         """
         Creates a retrieval QA chain with the specified retriever.
@@ -99,6 +107,8 @@ class ChatManager:
             template=system_template
         )
 
+        self._qa_prompt = qa_prompt
+
         # Create the chain. Some LangChain versions require dict for chain_type_kwargs and
         # may validate retriever type strictly. We standardize input for compatibility.
         self.chain = RetrievalQA.from_chain_type(
@@ -124,29 +134,19 @@ class ChatManager:
         Returns:
             str: The generated response
         """
-        # Extract text from documents
-        context_texts = [doc.page_content for doc in context_docs]
-        context_text = "\n".join(context_texts)
-
         if not self.chain:
+            # The chain fetches its own context, so only the direct path needs this
+            context_text = self._build_context(context_docs)
             # Handle direct LLM call if chain isn't set up
             try:
                 if self.llm:
-                    messages = [
-                        SystemMessage(content=f"You are a helpful assistant that answers questions based on the provided context. If you cannot find the answer in the context, say so.\n\nContext:\n{context_text}"),
-                        HumanMessage(content=query)
-                    ]
+                    messages = self._build_messages(query, context_text)
                     response = self.llm(messages)
                     return response.content
                 else:
                     # Raw fallback using google-generativeai
-                    model_name = Config.MODEL_NAME or "gemini-2.0-flash"
-                    model = genai.GenerativeModel(model_name)
-                    prompt = (
-                        "You are a helpful assistant that answers questions based on the provided context. "
-                        "If you cannot find the answer in the context, say so.\n\nContext:\n" + context_text + "\n\nQuestion: " + query
-                    )
-                    result = model.generate_content(prompt)
+                    prompt = self._build_prompt(query, context_text)
+                    result = self._genai_model.generate_content(prompt)
                     return getattr(result, "text", "(No response)")
 
             except Exception as e:
@@ -154,13 +154,12 @@ class ChatManager:
                 # Implement retry logic
                 for attempt in range(3):
                     try:
-                        time.sleep(1)  # Wait before retry
+                        time.sleep(0.5 * 2 ** attempt)  # Exponential backoff: 0.5s, 1s, 2s
                         if self.llm:
                             response = self.llm(messages)
                             return response.content
                         else:
-                            model = genai.GenerativeModel(Config.MODEL_NAME or "gemini-2.0-flash")
-                            result = model.generate_content(prompt)
+                            result = self._genai_model.generate_content(prompt)
                             return getattr(result, "text", "(No response)")
                     except Exception as retry_e:
                         print(f"Retry {attempt+1} failed: {str(retry_e)}")
@@ -176,6 +175,90 @@ class ChatManager:
                 # Fall back to direct LLM call
                 return self.generate_response(query, context_docs)
 
+    def generate_response_stream(self, query: str, context_docs: List[Document]) -> Iterator[str]:
+        """
+        Stream a response for the query, yielding text as the LLM produces it.
+
+        Mirrors generate_response (same prompts, same memory updates) so the UI can
+        render the first tokens instead of waiting for the full answer.
+
+        Args:
+            query: The user's question
+            context_docs: List of context documents retrieved for the query
+
+        Yields:
+            str: Successive pieces of the generated response
+        """
+        streamed = False
+        try:
+            if self.chain:
+                # Retrieve and prompt exactly like the "stuff" RetrievalQA chain
+                docs = self.chain.retriever.get_relevant_documents(query)
+                prompt = self._qa_prompt.format(
+                    context="\n\n".join(doc.page_content for doc in docs),
+                    question=query,
+                )
+                parts = []
+                for chunk in self.llm.stream(prompt):
+                    parts.append(chunk.content)
+                    streamed = True
+                    yield chunk.content
+                self.memory.save_context({"query": query}, {"result": "".join(parts)})
+                return
+
+            context_text = self._build_context(context_docs)
+            if self.llm:
+                for chunk in self.llm.stream(self._build_messages(query, context_text)):
+                    streamed = True
+                    yield chunk.content
+            else:
+                for chunk in self._genai_model.generate_content(self._build_prompt(query, context_text), stream=True):
+                    streamed = True
+                    yield chunk.text
+        except Exception as e:
+            print(f"Streaming error: {str(e)}")
+            if not streamed:
+                # Nothing shown yet; fall back to the blocking path with its retries
+                yield self.generate_response(query, context_docs)
+
+    def _build_context(self, context_docs: List[Document]) -> str:
+        """
+        Join document texts for a direct LLM call, capped at _max_context_chars.
+
+        Args:
+            context_docs: List of context documents retrieved for the query
+
+        Returns:
+            str: Newline-joined document texts, truncated at the cap
+        """
+        parts = []
+        remaining = self._max_context_chars
+        for doc in context_docs:
+            if remaining <= 0:
+                break
+            text = doc.page_content[:remaining]
+            parts.append(text)
+            remaining -= len(text) + 1  # Account for the joining newline
+        return "\n".join(parts)
+
+    def _build_messages(self, query: str, context_text: str) -> list:
+        """
+        Build the chat messages for a direct LLM call without the chain.
+        """
+        return [
+            SystemMessage(content=f"You are a helpful assistant that answers questions based on the provided context. If you cannot find the answer in the context, say so.\n\nContext:\n{context_text}"),
+            HumanMessage(content=query)
+        ]
+
+    def _build_prompt(self, query: str, context_text: str) -> str:
+        """
+        Build the plain-text prompt for the raw google-generativeai fallback.
+        """
+        return (
+            "You are a helpful assistant that answers questions based on the provided context. "
+            "If you cannot find the answer in the context, say so.\n\nContext:\n" + context_text + "\n\nQuestion: " + query
+        )
+
     def set_retriever(self, retriever):
         """
         Set the retriever and create a conversation chain.
@@ -204,6 +287,29 @@ class ChatManager:
         if self.memory:
             self.memory.clear()
 
+    def load_history(self, messages: List[dict]):
+        """
+        Replace the conversation memory with the tail of a stored conversation.
+        Only the last Config.MEMORY_WINDOW_K exchanges are replayed, which is all
+        the window memory would keep anyway.
+
+        Args:
+            messages: Stored messages as {"role", "content"} dicts, oldest first
+        """
+        if not self.memory:
+            return
+        self.memory.clear()
+        exchanges = []
+        question = None
+        for message in messages:
+            if message["role"] == "user":
+                question = message["content"]
+            elif message["role"] == "assistant" and question is not None:
+                exchanges.append((question, message["content"]))
+                question = None
+        for question, answer in exchanges[-Config.MEMORY_WINDOW_K:]:
+            self.memory.save_context({"query": question}, {"result": answer})
+
     def get_conversation_history(self):
         """
         Get the current conversation history.
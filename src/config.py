@@ -16,13 +16,29 @@ class Config:
     # Text chunking parameters
     CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
     CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+    # Total upload size from which PDFs are parsed in worker processes
+    PARALLEL_PDF_MIN_BYTES = int(os.getenv("PARALLEL_PDF_MIN_BYTES", str(256 * 1024)))
     
     # Model settings
     MODEL_NAME = os.getenv("MODEL_NAME", "gemini-2.0-flash")
     EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+    # Directory with an ONNX export of EMBEDDING_MODEL; empty uses PyTorch
+    EMBEDDING_ONNX_PATH = os.getenv("EMBEDDING_ONNX_PATH", "")
+    # Directory for per-chunk embedding vectors; set empty to disable caching
+    EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "cache")
     
     # Retrieval settings
     TOP_K = int(os.getenv("TOP_K", "4"))
+    MAX_CONTEXT_CHARS = int(os.getenv("MAX_CONTEXT_CHARS", "12000"))  # Cap on context sent to the LLM
+    # Storage for the TF-IDF fallback matrix: "float32" or "int8" (quantized)
+    TFIDF_DTYPE = os.getenv("TFIDF_DTYPE", "float32")
+    # Corpus size from which the TF-IDF fallback switches to a FAISS HNSW index
+    TFIDF_ANN_MIN_DOCS = int(os.getenv("TFIDF_ANN_MIN_DOCS", "500"))
+    # Corpus size from which the FAISS store switches to a compressed IVF-PQ index
+    FAISS_IVFPQ_MIN_DOCS = int(os.getenv("FAISS_IVFPQ_MIN_DOCS", "10000"))
+    FAISS_NLIST = int(os.getenv("FAISS_NLIST", "256"))
+    FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "16"))
     
     # LLM parameters
     LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.7"))
@@ -30,6 +46,11 @@ class Config:
     
     # Memory settings
     MAX_HISTORY_TOKENS = int(os.getenv("MAX_HISTORY_TOKENS", "2000"))
+    MEMORY_WINDOW_K = int(os.getenv("MEMORY_WINDOW_K", "6"))  # Exchanges kept in chat memory
+
+    # UI settings
+    CHAT_RENDER_LIMIT = int(os.getenv("CHAT_RENDER_LIMIT", "50"))  # Messages painted outside the "older" expander
+    HISTORY_LOAD_LIMIT = int(os.getenv("HISTORY_LOAD_LIMIT", "200"))  # Most recent messages loaded per conversation
 
     # Database settings
     DB_SERVER = os.getenv("DB_SERVER", "localhost")
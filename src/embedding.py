@@ -1,4 +1,6 @@
-from typing import List, Optional, Any
+from typing import Dict, List, Optional, Any
+import hashlib
+import os
 import numpy as np
 from langchain_core.documents import Document
 try:
@@ -17,39 +19,315 @@ try:
 except Exception:
     _HAS_SENTENCE_TRANSFORMERS = False
 
+# Encode on the GPU (in half precision) when torch can see one
+try:
+    import torch  # type: ignore
+    _HAS_CUDA = torch.cuda.is_available()
+except Exception:
+    _HAS_CUDA = False
+
 # Try primary embedding backend; fall back to TF-IDF if unavailable
 try:
     from langchain_community.embeddings import HuggingFaceEmbeddings  # type: ignore
     from langchain_community.vectorstores import FAISS  # type: ignore
+    from langchain_community.docstore.in_memory import InMemoryDocstore  # type: ignore
+    from langchain_community.vectorstores.utils import DistanceStrategy  # type: ignore
     _HAS_LC_HF = True
 except Exception:
     _HAS_LC_HF = False
 
-# Final gate: only use HuggingFaceEmbeddings when both are available
-_HAS_ST = _HAS_LC_HF and _HAS_SENTENCE_TRANSFORMERS
+# Optional ONNX Runtime backend for a pre-exported (quantized) embedding model
+try:
+    import onnxruntime as ort  # type: ignore
+    from tokenizers import Tokenizer  # type: ignore
+    from langchain_core.embeddings import Embeddings
+    _HAS_ONNX = bool(Config.EMBEDDING_ONNX_PATH)
+except Exception:
+    _HAS_ONNX = False
+    Embeddings = object  # type: ignore
+
+# Final gate: use the FAISS vector store when the wrappers and a model backend are available
+_HAS_ST = _HAS_LC_HF and (_HAS_SENTENCE_TRANSFORMERS or _HAS_ONNX)
 
 if not _HAS_ST:
+    import joblib  # type: ignore
     from sklearn.feature_extraction.text import TfidfVectorizer  # type: ignore
-    from sklearn.metrics.pairwise import cosine_similarity  # type: ignore
+
+# Optional direct FAISS access for compressed / ANN indexes; flat or exact search otherwise
+try:
+    import faiss  # type: ignore
+    _HAS_FAISS = True
+except Exception:
+    _HAS_FAISS = False
+
+# Optional SIMD kernels for the TF-IDF similarity scan; numpy is used otherwise
+try:
+    import simsimd  # type: ignore
+    _HAS_SIMSIMD = True
+except Exception:
+    _HAS_SIMSIMD = False
+
+# Optional JIT-compiled, multi-core kernel used when SimSIMD is not installed
+try:
+    from numba import njit, prange  # type: ignore
+    _HAS_NUMBA = True
+except Exception:
+    _HAS_NUMBA = False
+
+if _HAS_NUMBA:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _dot_rows(query, matrix):  # pragma: no cover - compiled
+        """Dot product of one query vector with every matrix row, rows split across cores."""
+        out = np.empty(matrix.shape[0], dtype=np.float32)
+        for i in prange(matrix.shape[0]):
+            acc = np.float32(0.0)
+            for j in range(matrix.shape[1]):
+                acc += query[j] * matrix[i, j]
+            out[i] = acc
+        return out
+
+
+class _TfidfIndex:
+    """
+    Dense TF-IDF matrix scanned with a SIMD (SimSIMD) or JIT (Numba) dot-product kernel.
+    TfidfVectorizer L2-normalizes every row (and every query), so the dot product
+    of a query with a row is already their cosine similarity.
+    Rows are stored as float32, or as int8 scaled by `scale` when
+    Config.TFIDF_DTYPE is "int8" (a quarter of the float32 bandwidth per scan).
+    Float32 corpora of at least Config.TFIDF_ANN_MIN_DOCS rows are additionally
+    indexed with a FAISS HNSW graph instead, so queries avoid the linear scan;
+    the graph keeps its own copy of the vectors, so the dense matrix is dropped.
+    """
+    def __init__(self, vectorizer, matrix, dtype: str = "float32"):
+        self.vectorizer = vectorizer
+        self.dtype = dtype
+        self.scale = 127.0 if dtype == "int8" else 1.0
+        self.matrix = self._encode(matrix.toarray())
+        self.ann = None
+        if _HAS_FAISS and dtype == "float32" and len(self.matrix) >= Config.TFIDF_ANN_MIN_DOCS:
+            self.ann = faiss.IndexHNSWFlat(self.matrix.shape[1], 32, faiss.METRIC_INNER_PRODUCT)
+            self.ann.add(self.matrix)
+            self.matrix = None  # HNSWFlat stores the vectors; don't hold them twice
+
+    def _encode(self, rows: np.ndarray) -> np.ndarray:
+        if self.dtype == "int8":
+            rows = np.rint(rows * self.scale)
+            return np.ascontiguousarray(rows, dtype=np.int8)
+        return np.ascontiguousarray(rows, dtype=np.float32)
+
+    def _query_vector(self, query: str) -> np.ndarray:
+        return self._encode(self.vectorizer.transform([query]).toarray())
+
+    def scores(self, query: str) -> np.ndarray:
+        """
+        Computes the cosine similarity between the query and every stored row.
+        Only available on the exact-scan path (no HNSW graph).
+
+        Args:
+            query: The search query
+
+        Returns:
+            np.ndarray: One similarity score per stored document
+        """
+        q_vec = self._query_vector(query)
+        if self.dtype == "int8":
+            if _HAS_SIMSIMD:
+                # Cosine is scale-invariant, so the int8 codes need no dequantization
+                return 1.0 - np.asarray(simsimd.cdist(q_vec, self.matrix, metric="cosine"))[0]
+            return (self.matrix.astype(np.int32) @ q_vec[0].astype(np.int32)) / self.scale ** 2
+        if _HAS_SIMSIMD:
+            return np.asarray(simsimd.cdist(q_vec, self.matrix, metric="dot"))[0]
+        if _HAS_NUMBA:
+            return _dot_rows(q_vec[0], self.matrix)
+        return self.matrix @ q_vec[0]
+
+    def top_k(self, query: str, k: int) -> np.ndarray:
+        """
+        Finds the k rows most similar to the query.
+
+        Uses the HNSW graph when one was built; otherwise an O(n) partial
+        selection that only sorts the k survivors.
+
+        Args:
+            query: The search query
+            k: Number of rows to return
+
+        Returns:
+            np.ndarray: Row indices ordered by descending similarity
+        """
+        if self.ann is not None:
+            self.ann.hnsw.efSearch = max(64, k)
+            _dists, idxs = self.ann.search(self._query_vector(query), k)
+            return idxs[0][idxs[0] >= 0]
+        sims = self.scores(query)
+        k = min(k, len(sims))
+        if k <= 0:
+            return np.empty(0, dtype=np.intp)
+        idxs = np.argpartition(sims, -k)[-k:]
+        return idxs[np.argsort(-sims[idxs])]
+
+class ONNXSTEmbeddings(Embeddings):
+    """
+    LangChain embeddings served by ONNX Runtime from an exported SentenceTransformer.
+    Expects model_dir to contain tokenizer.json and model.int8.onnx (or model.onnx),
+    as written by scripts/export_onnx_embeddings.py. Token states are mean-pooled
+    and L2-normalized, matching the sentence-transformers output.
+    """
+    def __init__(self, model_dir: str, batch_size: int = 64, max_length: int = 256):
+        model_path = os.path.join(model_dir, "model.int8.onnx")
+        if not os.path.exists(model_path):
+            model_path = os.path.join(model_dir, "model.onnx")
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self._session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self._session.get_inputs()}
+        self._tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self._tokenizer.enable_truncation(max_length=max_length)
+        self._tokenizer.enable_padding()
+        self.model_name = model_path
+        self.batch_size = batch_size
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        batches = []
+        for start in range(0, len(texts), self.batch_size):
+            encodings = self._tokenizer.encode_batch(texts[start:start + self.batch_size])
+            mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": mask,
+            }
+            if "token_type_ids" in self._input_names:
+                feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+            hidden = self._session.run(None, feeds)[0]
+
+            # Mean-pool over real tokens, then L2-normalize
+            weights = mask[..., None].astype(np.float32)
+            pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            batches.append(pooled.astype(np.float32))
+        return np.vstack(batches) if batches else np.empty((0, 0), dtype=np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0].tolist()
+
+def _corpus_hash(texts: List[str], salt: str = "") -> str:
+    """
+    Hashes an ordered list of chunks without ambiguity: each chunk is hashed on
+    its own and the chunk count plus per-chunk digests are hashed together, so
+    re-splitting the same text into different chunks yields a different key.
+    """
+    digest = hashlib.sha1(f"{salt}\0{len(texts)}".encode("utf-8"))
+    for text in texts:
+        digest.update(hashlib.sha1(text.encode("utf-8")).digest())
+    return digest.hexdigest()
+
+
+# Recently built TF-IDF indexes, keyed by corpus hash and storage dtype
+_TFIDF_INDEXES: Dict[str, _TfidfIndex] = {}
+_TFIDF_INDEXES_MAX = 4
+
+
+def _load_tfidf_index(texts: List[str]) -> _TfidfIndex:
+    """
+    Builds the TF-IDF index for a corpus, reusing earlier fits of the same corpus.
+
+    Indexes are memoized in-process, and the fitted vectorizer and matrix are
+    persisted under Config.EMBEDDING_CACHE_DIR so re-uploads skip the n-gram pass.
+
+    Args:
+        texts: The chunk texts
+
+    Returns:
+        _TfidfIndex: The index over the texts
+    """
+    corpus_hash = _corpus_hash(texts)
+    memo_key = f"{corpus_hash}-{Config.TFIDF_DTYPE}"
+    if memo_key in _TFIDF_INDEXES:
+        return _TFIDF_INDEXES[memo_key]
+
+    path = None
+    if Config.EMBEDDING_CACHE_DIR:
+        path = os.path.join(Config.EMBEDDING_CACHE_DIR, f"tfidf-{corpus_hash}.joblib")
+    fitted = None
+    if path and os.path.exists(path):
+        try:
+            fitted = joblib.load(path)
+            if fitted[1].shape[0] != len(texts):
+                fitted = None  # Stale or mismatched entry; refit
+        except Exception:
+            fitted = None  # Unreadable entry; refit
+    if fitted is None:
+        vectorizer = TfidfVectorizer(max_features=4096, ngram_range=(1, 2), dtype=np.float32)
+        fitted = (vectorizer, vectorizer.fit_transform(texts))
+        if path:
+            try:
+                os.makedirs(Config.EMBEDDING_CACHE_DIR, exist_ok=True)
+                joblib.dump(fitted, path)
+            except OSError as e:
+                print(f"Error caching TF-IDF model: {str(e)}")
+
+    index = _TfidfIndex(*fitted, dtype=Config.TFIDF_DTYPE)
+    if len(_TFIDF_INDEXES) >= _TFIDF_INDEXES_MAX:
+        _TFIDF_INDEXES.pop(next(iter(_TFIDF_INDEXES)))
+    _TFIDF_INDEXES[memo_key] = index
+    return index
+
+def load_embedding_model() -> Optional[Any]:
+    """
+    Loads the embedding model used by EmbeddingManager.
+
+    Loading the SentenceTransformer is expensive, so callers should load it once
+    and pass the same instance to every EmbeddingManager.
+
+    Returns:
+        The LangChain embedding model, or None when the TF-IDF fallback is in use
+    """
+    if not _HAS_ST:
+        return None
+    if _HAS_ONNX:
+        try:
+            return ONNXSTEmbeddings(Config.EMBEDDING_ONNX_PATH, batch_size=Config.EMBEDDING_BATCH_SIZE)
+        except Exception as e:
+            print(f"ONNX embedding model unavailable: {str(e)}")
+            if not _HAS_SENTENCE_TRANSFORMERS:
+                return None
+    device = "cuda" if _HAS_CUDA else "cpu"
+    model = HuggingFaceEmbeddings(
+        model_name=Config.EMBEDDING_MODEL,
+        model_kwargs={"device": device},
+        encode_kwargs={
+            "batch_size": Config.EMBEDDING_BATCH_SIZE,
+            "normalize_embeddings": True,
+        },
+    )
+    if device == "cuda":
+        model.client.half()
+    return model
 
 class EmbeddingManager:
     """
     Manages embeddings and retrieval using LangChain components.
     Uses SentenceTransformerEmbeddings for embeddings and FAISS for vector storage.
     """
-    def __init__(self):
+    def __init__(self, embedding_model: Optional[Any] = None):
+        """
+        Args:
+            embedding_model: Optional preloaded embedding model to share across
+                managers (see load_embedding_model); loaded on demand if omitted.
+        """
         # Initialize the embedding model using LangChain's HuggingFaceEmbeddings when available
         self.vectorstore = None
         self.retriever = None
         if _HAS_ST:
-            self.embedding_model = HuggingFaceEmbeddings(
-                model_name=Config.EMBEDDING_MODEL
-            )
+            self.embedding_model = embedding_model or load_embedding_model()
         else:
             # TF-IDF fallback components
             self.embedding_model = None
             self._tfidf: Optional[TfidfVectorizer] = None
-            self._tfidf_matrix = None
+            self._tfidf_index: Optional[_TfidfIndex] = None
             self._docs: List[Document] = []
 
     def create_embeddings(self, documents: List[Document]):
@@ -61,10 +339,11 @@ class EmbeddingManager:
         """
         try:
             if _HAS_ST:
-                # Create FAISS index from documents using LangChain
-                self.vectorstore = FAISS.from_documents(
-                    documents,
-                    self.embedding_model,
+                # Encode all chunks in batched calls, then index the precomputed vectors
+                texts = [d.page_content for d in documents]
+                vectors = self._embed_documents(texts)
+                self.vectorstore = self._build_vectorstore(
+                    texts, vectors, [d.metadata for d in documents]
                 )
                 # Create a retriever from the vector store
                 self.retriever = self.vectorstore.as_retriever(
@@ -75,20 +354,18 @@ class EmbeddingManager:
                 # Build TF-IDF matrix as a lightweight fallback
                 self._docs = documents
                 texts = [d.page_content for d in documents]
-                self._tfidf = TfidfVectorizer(max_features=4096, ngram_range=(1, 2))
-                self._tfidf_matrix = self._tfidf.fit_transform(texts)
+                self._tfidf_index = _load_tfidf_index(texts)
+                self._tfidf = self._tfidf_index.vectorizer
 
                 if _HAS_LC_CORE:
                     class TfidfRetriever(BaseRetriever):  # type: ignore
                         """Pydantic-compatible retriever using PrivateAttr storage."""
-                        _tfidf: Any = PrivateAttr()
-                        _matrix: Any = PrivateAttr()
+                        _index: Any = PrivateAttr()
                         _docs: List[Document] = PrivateAttr(default=[])
 
-                        def __init__(self, tfidf, matrix, docs):
+                        def __init__(self, index, docs):
                             super().__init__()
-                            self._tfidf = tfidf
-                            self._matrix = matrix
+                            self._index = index
                             self._docs = docs
 
                         def _get_relevant_documents(
@@ -97,9 +374,7 @@ class EmbeddingManager:
                             *,
                             run_manager: CallbackManagerForRetrieverRun,
                         ) -> List[Document]:  # noqa: D401
-                            q_vec = self._tfidf.transform([query])
-                            sims = cosine_similarity(q_vec, self._matrix)[0]
-                            idxs = np.argsort(-sims)[: Config.TOP_K]
+                            idxs = self._index.top_k(query, Config.TOP_K)
                             return [self._docs[i] for i in idxs]
 
                         async def _aget_relevant_documents(
@@ -110,27 +385,160 @@ class EmbeddingManager:
                         ) -> List[Document]:
                             return self._get_relevant_documents(query, run_manager=run_manager)
 
-                    self.retriever = TfidfRetriever(self._tfidf, self._tfidf_matrix, self._docs)
+                    self.retriever = TfidfRetriever(self._tfidf_index, self._docs)
                 else:
                     # Minimal fallback retriever (not compatible with RetrievalQA chain)
                     class SimpleTfidfRetriever:
-                        def __init__(self, tfidf, matrix, docs):
-                            self._tfidf = tfidf
-                            self._matrix = matrix
+                        def __init__(self, index, docs):
+                            self._index = index
                             self._docs = docs
 
                         def get_relevant_documents(self, query: str) -> List[Document]:
-                            q_vec = self._tfidf.transform([query])
-                            sims = cosine_similarity(q_vec, self._matrix)[0]
-                            idxs = np.argsort(-sims)[: Config.TOP_K]
+                            idxs = self._index.top_k(query, Config.TOP_K)
                             return [self._docs[i] for i in idxs]
 
-                    self.retriever = SimpleTfidfRetriever(self._tfidf, self._tfidf_matrix, self._docs)
+                    self.retriever = SimpleTfidfRetriever(self._tfidf_index, self._docs)
             return True
         except Exception as e:
             print(f"Error creating embeddings: {str(e)}")
             return False
 
+    def _build_vectorstore(self, texts: List[str], vectors: List[np.ndarray], metadatas: List[dict]):
+        """
+        Builds the FAISS vector store from precomputed vectors.
+
+        Vectors are L2-normalized once here and searched by inner product, which
+        equals cosine similarity on unit vectors (queries come out of the embedding
+        model normalized). Corpora of at least Config.FAISS_IVFPQ_MIN_DOCS chunks use
+        an IVF-PQ index, which stores each vector as a few dozen bytes of PQ codes
+        instead of full float32; trained indexes are saved under
+        Config.EMBEDDING_CACHE_DIR so re-uploads skip training. Smaller corpora
+        (or ones too small to train) keep the exact flat index.
+
+        Args:
+            texts: The chunk texts
+            vectors: One embedding per text
+            metadatas: One metadata dict per text
+
+        Returns:
+            FAISS: A LangChain FAISS vector store
+        """
+        matrix = np.ascontiguousarray(np.vstack(vectors), dtype=np.float32)
+        matrix /= np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None)
+
+        # k-means wants ~39 points per centroid; PQ codebooks have 256 centroids each
+        n_list = min(Config.FAISS_NLIST, len(texts) // 39)
+        if not _HAS_FAISS or len(texts) < max(Config.FAISS_IVFPQ_MIN_DOCS, 256) or n_list < 1:
+            return FAISS.from_embeddings(
+                list(zip(texts, matrix)),
+                self.embedding_model,
+                metadatas=metadatas,
+                distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
+            )
+
+        dim = matrix.shape[1]
+        # PQ needs the sub-quantizer count to divide the dimension (48 -> 8 dims each for 384)
+        n_sub = next(m for m in (48, 32, 24, 16, 12, 8, 4, 2, 1) if dim % m == 0)
+        factory = f"IVF{n_list},PQ{n_sub}x8"
+
+        # Training is slow (minutes at 10k+ chunks), so persist trained indexes per corpus
+        path = None
+        if Config.EMBEDDING_CACHE_DIR:
+            model_id = getattr(self.embedding_model, "model_name", Config.EMBEDDING_MODEL)
+            key = _corpus_hash(texts, salt=f"{model_id}\0{factory}")
+            path = os.path.join(Config.EMBEDDING_CACHE_DIR, f"ivfpq-{key}.faiss")
+        index = None
+        if path and os.path.exists(path):
+            try:
+                index = faiss.read_index(path)
+                if index.ntotal != len(texts):
+                    index = None  # Mismatched entry; rebuild
+            except Exception:
+                index = None  # Unreadable entry; rebuild
+        if index is None:
+            index = faiss.index_factory(dim, factory, faiss.METRIC_INNER_PRODUCT)
+            index.train(matrix)
+            index.add(matrix)
+            if path:
+                try:
+                    os.makedirs(Config.EMBEDDING_CACHE_DIR, exist_ok=True)
+                    faiss.write_index(index, path)
+                except Exception as e:
+                    print(f"Error caching FAISS index: {str(e)}")
+        faiss.extract_index_ivf(index).nprobe = Config.FAISS_NPROBE
+
+        ids = [str(i) for i in range(len(texts))]
+        docstore = InMemoryDocstore({
+            doc_id: Document(page_content=text, metadata=metadata)
+            for doc_id, text, metadata in zip(ids, texts, metadatas)
+        })
+        return FAISS(
+            self.embedding_model,
+            index,
+            docstore,
+            dict(enumerate(ids)),
+            distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
+        )
+
+    def _embed_documents(self, texts: List[str]) -> List[np.ndarray]:
+        """
+        Embeds texts, reusing vectors cached on disk by content hash.
+
+        Only cache misses are sent to the model (in a single batched call) and
+        their vectors are written back, so re-uploading a document costs disk IO only.
+
+        Args:
+            texts: The chunk texts to embed
+
+        Returns:
+            List[np.ndarray]: One vector per text, in input order
+        """
+        cache_dir = Config.EMBEDDING_CACHE_DIR
+        if cache_dir:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+            except OSError as e:
+                print(f"Error creating embedding cache: {str(e)}")
+                cache_dir = None  # Embed everything without caching
+        if not cache_dir:
+            return [np.asarray(v, dtype=np.float32) for v in self.embedding_model.embed_documents(texts)]
+
+        # Vectors differ per backend, so the cache is keyed by the loaded model too
+        model_id = getattr(self.embedding_model, "model_name", Config.EMBEDDING_MODEL)
+        paths = []
+        for text in texts:
+            key = hashlib.sha1(f"{model_id}\0{text}".encode("utf-8")).hexdigest()
+            paths.append(os.path.join(cache_dir, f"{key}.npy"))
+
+        vectors: List[Optional[np.ndarray]] = []
+        for path in paths:
+            try:
+                vectors.append(np.load(path) if os.path.exists(path) else None)
+            except Exception:
+                vectors.append(None)  # Unreadable entry; re-embed it
+
+        misses = [i for i, vec in enumerate(vectors) if vec is None]
+        if misses:
+            fresh = self.embedding_model.embed_documents([texts[i] for i in misses])
+            for i, vec in zip(misses, fresh):
+                vectors[i] = np.asarray(vec, dtype=np.float32)
+                try:
+                    np.save(paths[i], vectors[i])
+                except OSError as e:
+                    print(f"Error caching embedding: {str(e)}")
+        return vectors
+
+    def clear_embeddings(self):
+        """
+        Drops the current index and retriever while keeping the loaded embedding model.
+        """
+        self.vectorstore = None
+        self.retriever = None
+        if not _HAS_ST:
+            self._tfidf = None
+            self._tfidf_index = None
+            self._docs = []
+
     def search(self, query: str, k: Optional[int] = None) -> List[Document]:
         """
         Searches for relevant documents based on the query.
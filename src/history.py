@@ -4,6 +4,9 @@ from datetime import datetime
 class UserHistoryManager:
     def __init__(self, db_path="user_history.db"):
         self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        # WAL lets readers proceed while a write is in progress. The mode is stored in
+        # the database header, so the first run rewrites an existing DB file once.
+        self.conn.execute("PRAGMA journal_mode=WAL")
         self.create_tables()
         self.migrate_existing_data()
 
@@ -39,6 +42,12 @@ class UserHistoryManager:
             )
         """)
 
+        # Lets per-conversation lookups (and their LIMIT) avoid a full table scan
+        self.conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_messages_conversation
+            ON messages (conversation_id, timestamp)
+        """)
+
         # Legacy history table
         self.conn.execute("""
             CREATE TABLE IF NOT EXISTS history (
@@ -146,12 +155,35 @@ class UserHistoryManager:
         )
         self.conn.commit()
 
-    def get_conversation_messages(self, conversation_id):
-        """Get all messages for a conversation"""
-        cur = self.conn.execute(
-            "SELECT role, content, timestamp FROM messages WHERE conversation_id=? ORDER BY timestamp ASC",
+    def save_messages(self, conversation_id, messages):
+        """Save several (role, content) messages to a conversation in one transaction"""
+        self.conn.executemany(
+            "INSERT INTO messages (conversation_id, role, content) VALUES (?, ?, ?)",
+            [(conversation_id, role, content) for role, content in messages]
+        )
+        self.conn.execute(
+            "UPDATE conversations SET updated_at=CURRENT_TIMESTAMP WHERE id=?",
             (conversation_id,)
         )
+        self.conn.commit()
+
+    def get_conversation_messages(self, conversation_id, limit=None):
+        """Get messages for a conversation, oldest first; only the latest `limit` if given"""
+        if limit is None:
+            cur = self.conn.execute(
+                "SELECT role, content, timestamp FROM messages WHERE conversation_id=? ORDER BY timestamp ASC, id ASC",
+                (conversation_id,)
+            )
+            return cur.fetchall()
+
+        cur = self.conn.execute("""
+            SELECT role, content, timestamp FROM (
+                SELECT id, role, content, timestamp FROM messages
+                WHERE conversation_id=?
+                ORDER BY timestamp DESC, id DESC
+                LIMIT ?
+            ) ORDER BY timestamp ASC, id ASC
+        """, (conversation_id, limit))
         return cur.fetchall()
 
     def update_conversation_title(self, conversation_id, title):
@@ -183,8 +215,7 @@ class UserHistoryManager:
         else:
             conversation_id = result[0]
 
-        self.save_message(conversation_id, "user", question)
-        self.save_message(conversation_id, "assistant", answer)
+        self.save_messages(conversation_id, [("user", question), ("assistant", answer)])
 
     def fetch_history(self, username, limit=20):
         """Legacy method - returns messages from most recent conversation"""
@@ -198,7 +229,7 @@ class UserHistoryManager:
             return []
 
         conversation_id = result[0]
-        messages = self.get_conversation_messages(conversation_id)
+        messages = self.get_conversation_messages(conversation_id, limit=limit * 2)
 
         # Convert to legacy format (question, answer, timestamp)
         legacy_format = []
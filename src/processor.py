@@ -75,4 +75,21 @@ class PDFProcessor:
             return documents
         except Exception as e:
             print(f"Error processing document {pdf_file.name}: {str(e)}")
-            return []
\ No newline at end of file
+            return []
+
+
+def process_pdf_bytes(name: str, data: bytes) -> List[Document]:
+    """
+    Processes a PDF given as raw bytes. Module-level (and picklable) so uploads
+    can be parsed in worker processes.
+
+    Args:
+        name: The original file name, kept as the chunks' source
+        data: The PDF file contents
+
+    Returns:
+        List[Document]: A list of LangChain Document objects with text chunks
+    """
+    pdf_file = io.BytesIO(data)
+    pdf_file.name = name
+    return PDFProcessor().process_document(pdf_file)